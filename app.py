@@ -1,16 +1,334 @@
+import atexit
 import os
+import random
+import sys
 from abc import ABC, abstractmethod
 
 
+# Виды фигур. Код фигуры - вид для белых и вид + len(PIECE_KINDS) для черных;
+# код служит номером битборда фигуры и индексом её символа в PIECE_SYMBOLS.
+# Поля нумеруются от 0 (a1) до 63 (h8): номер поля = строка * 8 + столбец.
+PIECE_KINDS = 'PNBRQKEFGC'
+PIECE_SYMBOLS = PIECE_KINDS + PIECE_KINDS.lower()
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, SUPER_BISHOP, FENCE, GOSHA, CHECKER = range(len(PIECE_KINDS))
+# Названия цветов по номеру очереди хода: 0 - белые, 1 - черные.
+COLORS = ('white', 'black')
+
+# Имена полей по номеру поля и номера полей по имени.
+IDX_TO_POS = tuple(chr(ord('a') + col) + str(row + 1) for row in range(8) for col in range(8))
+POS_TO_IDX = {pos: square for square, pos in enumerate(IDX_TO_POS)}
+MASK64 = (1 << 64) - 1
+# Битборды всех полей, кроме вертикали a и кроме вертикали h (защита от переноса при сдвигах).
+NOT_FILE_A = 0xfefefefefefefefe
+NOT_FILE_H = 0x7f7f7f7f7f7f7f7f
+
+STRAIGHT_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0))
+GOSHA_OFFSETS = tuple((dr, dc) for dr in range(-2, 3) for dc in range(-2, 3) if (dr, dc) != (0, 0))
+
+
+def build_attack_table(offsets):
+    """Строит таблицу полей, на которые фигура прыгает с каждого поля.
+
+    Args:
+        offsets (tuple): Смещения хода в формате ((dr, dc), ...).
+
+    Returns:
+        list: Список из 64 битбордов, по одному на каждое исходное поле.
+    """
+    table = []
+    for square in range(64):
+        row, col = square >> 3, square & 7
+        attacks = 0
+        for dr, dc in offsets:
+            new_row, new_col = row + dr, col + dc
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                attacks |= 1 << ((new_row << 3) | new_col)
+        table.append(attacks)
+    return table
+
+
+KNIGHT_ATTACKS = build_attack_table(KNIGHT_OFFSETS)
+KING_ATTACKS = build_attack_table(KING_OFFSETS)
+GOSHA_ATTACKS = build_attack_table(GOSHA_OFFSETS)
+
+
+def build_pawn_tables():
+    """Строит таблицы ходов пешек обоих цветов.
+
+    Returns:
+        tuple: Три словаря {цвет: список из 64 битбордов}: ход на одну клетку,
+            ход на две клетки с начальной горизонтали и поля взятия по диагонали.
+    """
+    pushes, double_pushes, captures = {}, {}, {}
+    for color, direction, start_row in (('white', 1, 1), ('black', -1, 6)):
+        pushes[color], double_pushes[color], captures[color] = [0] * 64, [0] * 64, [0] * 64
+        for square in range(64):
+            row, col = square >> 3, square & 7
+            new_row = row + direction
+            if not 0 <= new_row < 8:
+                continue
+            pushes[color][square] = 1 << ((new_row << 3) | col)
+            if row == start_row:
+                double_pushes[color][square] = 1 << (((new_row + direction) << 3) | col)
+            for dc in (-1, 1):
+                if 0 <= col + dc < 8:
+                    captures[color][square] |= 1 << ((new_row << 3) | (col + dc))
+    return pushes, double_pushes, captures
+
+
+PAWN_PUSHES, PAWN_DOUBLE_PUSHES, PAWN_CAPTURES = build_pawn_tables()
+
+
+def build_checker_tables():
+    """Строит таблицы ходов шашек обоих цветов.
+
+    Returns:
+        dict: {цвет: список из 64 кортежей [(шаг, прыжок), ...]}, где шаг - битборд
+            соседнего поля по диагонали вперед, а прыжок - битборд поля за ним
+            (0, если прыжок уходит за край доски).
+    """
+    tables = {}
+    for color, direction in (('white', -1), ('black', 1)):
+        tables[color] = []
+        for square in range(64):
+            row, col = square >> 3, square & 7
+            pairs = []
+            for dc in (-1, 1):
+                new_row, new_col = row + direction, col + dc
+                if not (0 <= new_row < 8 and 0 <= new_col < 8):
+                    continue
+                jump_row, jump_col = new_row + direction, new_col + dc
+                jump = 1 << ((jump_row << 3) | jump_col) if 0 <= jump_row < 8 and 0 <= jump_col < 8 else 0
+                pairs.append((1 << ((new_row << 3) | new_col), jump))
+            tables[color].append(tuple(pairs))
+    return tables
+
+
+CHECKER_MOVES = build_checker_tables()
+
+
+def build_between_table():
+    """Строит таблицу полей между двумя полями одной линии.
+
+    Returns:
+        list: Таблица 64 x 64 битбордов: BETWEEN[a][b] - поля строго между a и b,
+            если они лежат на одной вертикали, горизонтали или диагонали, иначе 0.
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        row, col = square >> 3, square & 7
+        for dr, dc in STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS:
+            between = 0
+            new_row, new_col = row + dr, col + dc
+            while 0 <= new_row < 8 and 0 <= new_col < 8:
+                target = (new_row << 3) | new_col
+                table[square][target] = between
+                between |= 1 << target
+                new_row, new_col = new_row + dr, new_col + dc
+    return table
+
+
+BETWEEN = build_between_table()
+
+
+def build_slide_attacks(square, occupied, directions):
+    """Возвращает битборд полей, атакуемых по лучам с поля square.
+
+    Луч идет до края доски или до первой фигуры (поле с ней входит в атаку).
+
+    Args:
+        square (int): Исходное поле.
+        occupied (int): Битборд занятых полей.
+        directions (tuple): Направления лучей в формате ((dr, dc), ...).
+    """
+    row, col = square >> 3, square & 7
+    attacks = 0
+    for dr, dc in directions:
+        new_row, new_col = row + dr, col + dc
+        while 0 <= new_row < 8 and 0 <= new_col < 8:
+            bit = 1 << ((new_row << 3) | new_col)
+            attacks |= bit
+            if occupied & bit:
+                break
+            new_row, new_col = new_row + dr, new_col + dc
+    return attacks
+
+
+def build_magic_tables(directions, magics):
+    """Строит таблицы магических битбордов для дальнобойной фигуры.
+
+    Маска поля - поля его лучей без крайних (фигура на краю луч не обрывает).
+    Индекс в таблице атак - ((occupied & mask) * magic) >> shift, где
+    shift = 64 - число бит маски; магические числа подобраны так, что разные
+    расстановки блокирующих фигур с разными атаками не дают одинаковых индексов.
+
+    Каждая расстановка блокирующих фигур при построении сверяется с
+    build_slide_attacks: если магическое число дает коллизию с другим набором
+    атак, таблица была бы неверной, поэтому построение прерывается.
+
+    Args:
+        directions (tuple): Направления лучей в формате ((dr, dc), ...).
+        magics (tuple): Магические числа для каждого из 64 полей.
+
+    Returns:
+        tuple: Списки масок, сдвигов и таблиц атак для каждого поля.
+
+    Raises:
+        ValueError: Если магическое число поля дает коллизию в таблице атак.
+    """
+    masks, shifts, tables = [], [], []
+    for square in range(64):
+        row, col = square >> 3, square & 7
+        mask = 0
+        for dr, dc in directions:
+            new_row, new_col = row + dr, col + dc
+            while 0 <= new_row + dr < 8 and 0 <= new_col + dc < 8:
+                mask |= 1 << ((new_row << 3) | new_col)
+                new_row, new_col = new_row + dr, new_col + dc
+        shift = 64 - bin(mask).count('1')
+        table = [None] * (1 << (64 - shift))
+        # Перебор всех подмножеств маски (Carry-Rippler)
+        blockers = 0
+        while True:
+            index = ((blockers * magics[square]) & MASK64) >> shift
+            attacks = build_slide_attacks(square, blockers, directions)
+            if table[index] is None:
+                table[index] = attacks
+            elif table[index] != attacks:
+                raise ValueError(f'Магическое число {magics[square]:#x} для поля {square} дает коллизию')
+            blockers = (blockers - mask) & mask
+            if not blockers:
+                break
+        masks.append(mask)
+        shifts.append(shift)
+        tables.append([0 if attacks is None else attacks for attacks in table])
+    return masks, shifts, tables
+
+
+# Магические числа найдены заранее случайным поиском. Кандидаты - разреженные
+# 64-битные числа, полученные побитовым И трех случайных 64-битных чисел.
+# При импорте build_magic_tables заново проверяет их на коллизии и при
+# коллизии выбрасывает ValueError.
+ROOK_MAGICS = (
+    0x128012C0008000E0, 0x0240002000401001, 0x4100200041001008, 0x8280100008018004,
+    0x2080080002040080, 0x1300010004008208, 0x04000208A9101408, 0x020000204A018F04,
+    0x1080800040008020, 0x0000C01000402001, 0x0080808010002000, 0x0408800800801000,
+    0x0010800801040080, 0x4804800400804200, 0x0304800D00800200, 0x010200040081006A,
+    0x8280044020084000, 0x042000C010004021, 0x2010002004080020, 0x0040210010000900,
+    0x0008004004020041, 0x0004008080040200, 0x1C20040070610208, 0x1020A20000508104,
+    0x0100C00380008120, 0x4001200280400080, 0x0200100080200080, 0x0000401200082200,
+    0xC02C080080040080, 0x0840040080020080, 0x2102004040800100, 0x0042079A00004104,
+    0x0000400424800280, 0x4820100020400040, 0x5010002000801880, 0x9061080081801002,
+    0x208A050011000800, 0x000200080E003094, 0xA010018204003008, 0x2000288042001401,
+    0x400181C000228000, 0x0200402010004000, 0x8388928600420021, 0x400021001001000A,
+    0x2100080011010004, 0x1002020004008080, 0x0802000804020001, 0x88004410408A0001,
+    0x010508C030800100, 0x4000400080310100, 0x0030200010048080, 0x2000800800100080,
+    0x0100040008008080, 0x0022000204008080, 0x0108020170284400, 0x1001010084004200,
+    0x0004890141902202, 0x0100881100220042, 0x0100102001000841, 0x4408050020081001,
+    0x0002008884201002, 0x2002000490410802, 0x0020014800900204, 0x0100082081044402,
+)
+BISHOP_MAGICS = (
+    0x0010104088840042, 0x0110104081004062, 0x0091142082000100, 0x0108208821008100,
+    0x0101104000080000, 0x010104200404001C, 0x0C01040202C00010, 0x0001004800841080,
+    0xCA8B46100E280102, 0x001010D00085024C, 0x4180089881020120, 0x8010082050411000,
+    0x0800020210100000, 0x0002120905201200, 0xC000040404040510, 0x0110410101100200,
+    0x0042201408020C27, 0xA882000404440C20, 0x0002000102040100, 0x800200202202C200,
+    0x4002005012101401, 0x2441014880600200, 0x0214020104018400, 0x000180004414410A,
+    0x0105410C10020800, 0x0004200084013400, 0x200582045004001B, 0x1000404004010200,
+    0x0001001081004021, 0x2400430202008628, 0x000604C144230800, 0x04004840008A1804,
+    0x4010045000220210, 0x2012100400500120, 0x10001C0205900081, 0x0020880800360A00,
+    0x8500460020060080, 0x0420008209010110, 0x0010020250008C00, 0x8010A40100004104,
+    0x00008208400022C8, 0x0008410450402100, 0x0008920110004104, 0x43A8011044002024,
+    0x0029102021900602, 0x2270101000212040, 0x0020C41112004040, 0x3004840550C42200,
+    0x5002022202404480, 0x0402822309200840, 0x0032010423240048, 0x2000CA0384110008,
+    0x4001140410440000, 0x2092E50810011010, 0x0140040852005041, 0x00200200C1010104,
+    0x40120202020104E0, 0xA000010042300500, 0x400048004A009001, 0x4200800400411081,
+    0x0010040604105400, 0x0107004210024080, 0x0004423004210040, 0xC220023088010040,
+)
+
+ROOK_MASKS, ROOK_SHIFTS, ROOK_ATTACKS = build_magic_tables(STRAIGHT_DIRECTIONS, ROOK_MAGICS)
+BISHOP_MASKS, BISHOP_SHIFTS, BISHOP_ATTACKS = build_magic_tables(DIAGONAL_DIRECTIONS, BISHOP_MAGICS)
+
+
+def rook_attacks(square, occupied):
+    """Битборд полей, атакуемых ладьей с поля square при занятости occupied."""
+    return ROOK_ATTACKS[square][(((occupied & ROOK_MASKS[square]) * ROOK_MAGICS[square]) & MASK64) >> ROOK_SHIFTS[square]]
+
+
+def bishop_attacks(square, occupied):
+    """Битборд полей, атакуемых слоном с поля square при занятости occupied."""
+    return BISHOP_ATTACKS[square][(((occupied & BISHOP_MASKS[square]) * BISHOP_MAGICS[square]) & MASK64) >> BISHOP_SHIFTS[square]]
+
+
+# Ключи Зобриста: случайное 64-битное число на каждую пару (код фигуры, поле)
+# и ключ очереди хода. Хеш позиции - XOR ключей всех фигур на доске.
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in PIECE_SYMBOLS]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+# Наибольшее число записей в кешах фигур под угрозой и ходов фигур.
+THREAT_CACHE_SIZE = 1 << 16
+MOVES_CACHE_SIZE = 1 << 14
+
+
+def cache_fetch(cache, key, limit, compute):
+    """Возвращает значение из кеша, вычисляя и запоминая его при промахе.
+
+    Словарь хранит записи в порядке использования: найденная запись переносится
+    в конец, а при переполнении вытесняется самая давняя.
+
+    Args:
+        cache (dict): Словарь-кеш.
+        key: Ключ записи.
+        limit (int): Наибольшее число записей.
+        compute (callable): Функция без аргументов, вычисляющая значение.
+
+    Returns:
+        Значение из кеша или только что вычисленное.
+    """
+    value = cache.pop(key, None)
+    if value is None:
+        value = compute()
+        if len(cache) >= limit:
+            del cache[next(iter(cache))]
+    cache[key] = value
+    return value
+
+
+def _straight_valid(board, start, end, color_idx):
+    """Проверяет ход по вертикали или горизонтали (ладья, ферзь).
+
+    Сначала проверяется целевое поле (один бит), и только затем ищутся атаки.
+    """
+    return board.can_capture(end, color_idx) and bool((rook_attacks(start, board.occupied) >> end) & 1)
+
+
+def _diagonal_valid(board, start, end, color_idx):
+    """Проверяет ход по диагонали (слон, ферзь); целевое поле проверяется первым."""
+    return board.can_capture(end, color_idx) and bool((bishop_attacks(start, board.occupied) >> end) & 1)
+
+
 class ChessPiece(ABC):
     """Класс шахматных фигур.
 
     Attributes:
         color (str): Цвет фигуры ('white' или 'black').
-        location (str): Текущая позиция на доске (например, 'e2').
+        color_idx (int): Номер цвета фигуры: 0 - белые, 1 - черные (индекс в COLORS).
+        sq (int): Номер поля, на котором стоит фигура (0 - a1, 63 - h8).
         symbol (str): Символ для отображения на доске.
         replacement (str): Какую фигуру заменяет (для новых фигур, по умолчанию None).
+        kind (int): Вид фигуры (атрибут класса, одна из констант PAWN, ..., CHECKER).
+        code (int): Код фигуры с учетом цвета (номер битборда на доске).
+        invulnerable (bool): Неуязвима ли фигура (атрибут класса).
     """
+    __slots__ = ('color', 'color_idx', 'sq', 'code', 'symbol', 'replacement')
+    kind = None
+    invulnerable = False
+
     def __init__(self, color, location):
         """Инициализация фигуры.
 
@@ -19,8 +337,10 @@ class ChessPiece(ABC):
             location (str): Начальная позиция (например, 'e2').
         """
         self.color = color
-        self.location = location
-        self.symbol = ''
+        self.color_idx = COLORS.index(color)
+        self.sq = POS_TO_IDX[location]
+        self.code = self.kind + self.color_idx * len(PIECE_KINDS)
+        self.symbol = PIECE_SYMBOLS[self.code]
         self.replacement = None
 
     @abstractmethod
@@ -35,6 +355,39 @@ class ChessPiece(ABC):
         """
         pass
 
+    def get_attacks(self, board):
+        """Возвращает битборд полей, на которых фигура может взять фигуру соперника.
+
+        Битборд может содержать и пустые поля: вызывающий код пересекает его
+        с занятостью нужного цвета. По умолчанию строится по списку возможных
+        ходов; фигуры с таблицами атак переопределяют метод.
+
+        Args:
+            board (ChessBoard): Текущая доска.
+
+        Returns:
+            int: Битборд атакованных полей.
+        """
+        attacks = 0
+        for pos in self.get_possible_moves(board):
+            attacks |= 1 << POS_TO_IDX[pos]
+        return attacks
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет, допустим ли ход фигуры на заданную позицию.
+
+        Фигуры могут переопределить проверку, чтобы не строить
+        полный список возможных ходов.
+
+        Args:
+            new_location (str): Целевая позиция.
+            board (ChessBoard): Текущая доска.
+
+        Returns:
+            bool: True, если ход допустим, иначе False.
+        """
+        return new_location in self.get_possible_moves(board)
+
     def move(self, new_location, board):
         """Перемещает фигуру на новую позицию, если ход допустим.
 
@@ -45,8 +398,8 @@ class ChessPiece(ABC):
         Returns:
             bool: True, если ход успешен, иначе False.
         """
-        if new_location in self.get_possible_moves(board):
-            board.make_move(self.location + '-' + new_location)
+        if self.is_valid_move(new_location, board):
+            board.make_move(IDX_TO_POS[self.sq] + '-' + new_location)
             return True
         return False
 
@@ -54,383 +407,580 @@ class ChessPiece(ABC):
 # Класс пешек (будь он не ладен)
 class Pawn(ChessPiece):
     """Класс для пешки."""
+    __slots__ = ('direction', 'en_passant_row', 'opponent_idx', 'pushes', 'double_pushes', 'captures')
+    kind = PAWN
+
     def __init__(self, color, position):
         super().__init__(color, position)
-        self.symbol = 'P' if color == 'white' else 'p'
+        self.direction = 1 if color == 'white' else -1
+        self.en_passant_row = 4 if color == 'white' else 3
+        # Таблицы ходов и цвет соперника выбираются один раз, а не при каждом вызове
+        self.opponent_idx = 1 - self.color_idx
+        self.pushes = PAWN_PUSHES[color]
+        self.double_pushes = PAWN_DOUBLE_PUSHES[color]
+        self.captures = PAWN_CAPTURES[color]
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для пешки."""
-        moves = []
-        row, col = board.pos_to_indices(self.position)
-        direction = 1 if self.color == 'white' else -1
-        start_row = 1 if self.color == 'white' else 6
-
-        # Здесь реализован обыкновыенный ход вперёд
-        new_row = row + direction
-        if 0 <= new_row < 8 and board.board[new_row][col] is None:
-            moves.append(board.indices_to_pos(new_row, col))
-            if row == start_row and board.board[new_row + direction][col] is None:
-                moves.append(board.indices_to_pos(new_row + direction, col))
-
+        return board.bb_to_positions(self.get_targets(board))
+
+    def get_targets(self, board):
+        """Возвращает битборд полей, на которые может пойти пешка."""
+        square = self.sq
+        row, col = square >> 3, square & 7
+        empty = ~board.occupied
+
+        # Здесь реализован обыкновыенный ход вперёд (на две клетки - только через пустое поле)
+        targets = self.pushes[square] & empty
+        if targets:
+            targets |= self.double_pushes[square] & empty
         # Здесь представлено взятие по диагонали
-        for dc in [-1, 1]:
-            if 0 <= col + dc < 8 and 0 <= new_row < 8:
-                target = board.board[new_row][col + dc]
-                if target and target.color != self.color:
-                    moves.append(board.indices_to_pos(new_row, col + dc))
+        targets |= self.captures[square] & board.get_occupancy(self.opponent_idx)
 
         # Пресловутое взятие на проходе.
-        if self.color == 'white' and self.position[1] == '5':
-            for dc in [-1, 1]:
-                col_adj = col + dc
-                if 0 <= col_adj < 8:
-                    adjacent_piece = board.board[row][col_adj]
-                    if adjacent_piece and adjacent_piece.color == 'black' and isinstance(adjacent_piece, Pawn):
-                        last_move = board.move_history[-1] if board.move_history else None
-                        if last_move and last_move.piece == adjacent_piece and last_move.start_pos[1] == '7' and last_move.end_pos[1] == '5':
-                            moves.append(board.indices_to_pos(row + 1, col_adj))
-        elif self.color == 'black' and self.position[1] == '4':
-            for dc in [-1, 1]:
-                col_adj = col + dc
-                if 0 <= col_adj < 8:
-                    adjacent_piece = board.board[row][col_adj]
-                    if adjacent_piece and adjacent_piece.color == 'white' and isinstance(adjacent_piece, Pawn):
-                        last_move = board.move_history[-1] if board.move_history else None
-                        if last_move and last_move.piece == adjacent_piece and last_move.start_pos[1] == '2' and last_move.end_pos[1] == '4':
-                            moves.append(board.indices_to_pos(row - 1, col_adj))
-        return moves
+        if row == self.en_passant_row and board.history:
+            last_move = board.history[-1]
+            start_row = last_move.start_sq >> 3
+            end_row, end_col = last_move.end_sq >> 3, last_move.end_sq & 7
+            if (last_move.piece.kind == PAWN and last_move.piece.color_idx != self.color_idx
+                    and start_row == row + 2 * self.direction and end_row == row and abs(end_col - col) == 1):
+                targets |= 1 << (((row + self.direction) << 3) | end_col)
+        return targets
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход пешки по битборду её целевых полей."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        return bool((self.get_targets(board) >> end) & 1)
+
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые пешка бьет по диагонали."""
+        return self.captures[self.sq]
 
 
 class Rook(ChessPiece):
     """Класс ладей."""
-    def __init__(self, color, location):
-        super().__init__(color, location)
-        self.symbol = 'R' if color == 'white' else 'r'
+    __slots__ = ()
+    kind = ROOK
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для ладьи."""
-        return board.get_straight_moves(self.location, self.color)
+        return board.get_straight_moves(self.sq, self.color_idx)
+
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые бьет ладья."""
+        return rook_attacks(self.sq, board.occupied) & ~board.invulnerable
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход ладьи по таблице магических битбордов."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        return _straight_valid(board, self.sq, end, self.color_idx)
 
 
 class Knight(ChessPiece):
     """Класс коней."""
-    def __init__(self, color, location):
-        super().__init__(color, location)
-        self.symbol = 'N' if color == 'white' else 'n'
+    __slots__ = ()
+    kind = KNIGHT
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для коня."""
-        moves = []
-        row, col = board.pos_to_indices(self.location)
-        offsets = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-        for dr, dc in offsets:
-            new_row, new_col = row + dr, col + dc
-            if 0 <= new_row < 8 and 0 <= new_col < 8:
-                target = board.board[new_row][new_col]
-                if target is None or target.color != self.color:
-                    moves.append(board.indices_to_pos(new_row, new_col))
-        return moves
+        attacks = KNIGHT_ATTACKS[self.sq]
+        return board.bb_to_positions(attacks & ~board.get_occupancy(self.color_idx))
+
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые бьет конь."""
+        return KNIGHT_ATTACKS[self.sq]
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход коня по таблице прыжков."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        attacks = KNIGHT_ATTACKS[self.sq] & ~board.get_occupancy(self.color_idx)
+        return bool((attacks >> end) & 1)
 
 
 class Bishop(ChessPiece):
     """Класс слонов."""
-    def __init__(self, color, location):
-        super().__init__(color, location)
-        self.symbol = 'B' if color == 'white' else 'b'
+    __slots__ = ()
+    kind = BISHOP
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для слона."""
-        return board.get_diagonal_moves(self.location, self.color)
+        return board.get_diagonal_moves(self.sq, self.color_idx)
+
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые бьет слон."""
+        return bishop_attacks(self.sq, board.occupied) & ~board.invulnerable
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход слона по таблице магических битбордов."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        return _diagonal_valid(board, self.sq, end, self.color_idx)
 
 
 class Queen(ChessPiece):
     """Класс ферзей."""
-    def __init__(self, color, location):
-        super().__init__(color, location)
-        self.symbol = 'Q' if color == 'white' else 'q'
+    __slots__ = ()
+    kind = QUEEN
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для ферзя."""
-        return board.get_straight_moves(self.location, self.color) + \
-               board.get_diagonal_moves(self.location, self.color)
+        return board.get_queen_moves(self.sq, self.color_idx)
+
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые бьет ферзь."""
+        attacks = rook_attacks(self.sq, board.occupied) | bishop_attacks(self.sq, board.occupied)
+        return attacks & ~board.invulnerable
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход ферзя по объединению атак ладьи и слона."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        if not board.can_capture(end, self.color_idx):
+            return False
+        return bool((self.get_attacks(board) >> end) & 1)
 
 
 class King(ChessPiece):
     """Класс королей."""
-    def __init__(self, color, location):
-        super().__init__(color, location)
-        self.symbol = 'K' if color == 'white' else 'k'
+    __slots__ = ()
+    kind = KING
+    attack_table = KING_ATTACKS
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для короля."""
-        moves = []
-        row, col = board.pos_to_indices(self.location)
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                new_row, new_col = row + dr, col + dc
-                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                    target = board.board[new_row][new_col]
-                    if target is None or target.color != self.color:
-                        moves.append(board.indices_to_pos(new_row, new_col))
-        return moves
+        attacks = self.attack_table[self.sq]
+        return board.bb_to_positions(attacks & ~board.get_occupancy(self.color_idx))
+
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые бьет король."""
+        return self.attack_table[self.sq]
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход короля по таблице соседних полей."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        attacks = self.attack_table[self.sq] & ~board.get_occupancy(self.color_idx)
+        return bool((attacks >> end) & 1)
 
 
 class SuperBishop(Bishop):
     """Класс Суперслонов (заменителя слонов)."""
+    __slots__ = ()
+    kind = SUPER_BISHOP
+
     def __init__(self, color, location):
         super().__init__(color, location)
-        self.symbol = 'E' if color == 'white' else 'e'
         self.replacement = 'Bishop'
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для Суперслона."""
-        return board.get_diagonal_moves(self.location, self.color, super_bishop=True)
+        return board.get_super_diagonal_moves(self.sq, self.color_idx)
 
-    def move(self, location, board):
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые бьет Суперслон (фигуры на пути не мешают)."""
+        return bishop_attacks(self.sq, 0) & ~board.invulnerable
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход Суперслона: фигуры на пути ему не мешают, важна только диагональ."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        if not board.can_capture(end, self.color_idx):
+            return False
+        # Атаки по пустой доске - обе диагонали целиком
+        diagonals = bishop_attacks(self.sq, 0)
+        return bool((diagonals >> end) & 1)
+
+    def move(self, new_location, board):
         """Перемещает Суперслона, съедая все фигуры на пути."""
-        if new_location in self.get_possible_moves(board):
-            board.make_move(self.location + '-' + new_location, super_bishop=True)
+        if self.is_valid_move(new_location, board):
+            board.make_move(IDX_TO_POS[self.sq] + '-' + new_location, super_bishop=True)
             return True
         return False
 
 
 class Fence(Pawn):
     """Класс Забора (заменителя пешек)."""
+    __slots__ = ()
+    kind = FENCE
+    invulnerable = True
+
     def __init__(self, color, location):
         super().__init__(color, location)
-        self.symbol = 'F' if color == 'white' else 'f'
         self.replacement = 'Pawn'
-        self.invulnerable = True
 
-    def get_possible_moves(self, board):
-        """Возвращает список возможных ходов для Забора."""
-        moves = []
-        row, col = board.pos_to_indices(self.location)
-        direction = 1 if self.color == 'white' else -1
+    def get_targets(self, board):
+        """Возвращает битборд полей, на которые может пойти Забор."""
+        enemy = board.get_occupancy(self.opponent_idx) & ~board.invulnerable
 
-        # Это шажок вперёд
-        new_row = row + direction
-        if 0 <= new_row < 8 and board.board[new_row][col] is None:
-            moves.append(board.indices_to_pos(new_row, col))
+        # Это шажок вперёд (только на пустое поле)
+        targets = self.pushes[self.sq] & ~board.occupied
+        # Это кушанье диагональное (неуязвимые фигуры не берутся)
+        targets |= self.captures[self.sq] & enemy
+        return targets
 
-        # Это кушанье диагональное
-        for dr, dc in [(direction, -1), (direction, 1), (direction, 0)]:
-            new_row, new_col = row + dr, col + dc
-            if 0 <= new_row < 8 and 0 <= new_col < 8:
-                target = board.board[new_row][new_col]
-                if target and target.color != self.color and (not getattr(target, 'invulnerable', False)):
-                    moves.append(board.indices_to_pos(new_row, new_col))
-        return moves
+    def get_attacks(self, board):
+        """Возвращает битборд полей, которые Забор бьет по диагонали."""
+        return self.captures[self.sq] & ~board.invulnerable
 
 
 class Gosha(King):
     """Класс Гоши (Заменителя короля)."""
+    __slots__ = ()
+    kind = GOSHA
+    attack_table = GOSHA_ATTACKS
+
     def __init__(self, color, location):
         super().__init__(color, location)
-        self.symbol = 'G' if color == 'white' else 'g'
         self.replacement = 'King'
 
-    def get_possible_moves(self, board):
-        """Возвращает список возможных ходов для Гоши."""
-        moves = []
-        row, col = board.pos_to_indices(self.location)
-        for dr in range(-2, 3):
-            for dc in range(-2, 3):
-                if dr == 0 and dc == 0:
-                    continue
-                new_row, new_col = row + dr, col + dc
-                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                    target = board.board[new_row][new_col]
-                    if target is None or target.color != self.color:
-                        moves.append(board.indices_to_pos(new_row, new_col))
-        return moves
-
 
 class Move:
     """Класс ходов.
 
     Attributes:
-        start_pos (str): Начальная позиция.
-        end_pos (str): Конечная позиция.
+        start_sq (int): Номер начального поля.
+        end_sq (int): Номер конечного поля.
         piece (ChessPiece): Фигура, которая ходила.
         captured (ChessPiece): Съеденная фигура (если есть).
+        captured_sq (int): Поле съеденной фигуры (при взятии на проходе не совпадает с end_sq).
+        eaten (list): Фигуры, съеденные Суперслоном на пути, - пары (поле, фигура).
     """
-    def __init__(self, start_pos, end_pos, piece, captured=None):
-        self.start_pos = start_pos
-        self.end_pos = end_pos
+    __slots__ = ('start_sq', 'end_sq', 'piece', 'captured', 'captured_sq', 'eaten')
+
+    def __init__(self, start_sq, end_sq, piece, captured=None, captured_sq=None, eaten=()):
+        self.start_sq = start_sq
+        self.end_sq = end_sq
         self.piece = piece
         self.captured = captured
+        self.captured_sq = end_sq if captured_sq is None else captured_sq
+        self.eaten = eaten
 
 
 class ChessBoard:
     """Класс управления шахматной доской.
 
+    Помимо списка фигур доска хранит битборды - 64-битные числа, в которых
+    бит с номером поля установлен, если поле занято.
+
     Attributes:
-        board (list): Двумерный список 8x8 с фигурами.
-        movement_history (list): История ходов.
+        board (list): Список из 64 полей с фигурами (индекс - номер поля).
+        bb (list): Битборды фигур, по одному на каждый символ из PIECE_SYMBOLS.
+        occupied_white (int): Битборд полей, занятых белыми фигурами.
+        occupied_black (int): Битборд полей, занятых черными фигурами.
+        occupied (int): Битборд всех занятых полей.
+        invulnerable (int): Битборд неуязвимых фигур.
+        zhash (int): Хеш Зобриста текущей позиции (с учетом очереди хода).
+        history (list): История ходов (объекты Move).
     """
     def __init__(self):
         """Инициализация доски с начальной расстановкой."""
-        self.board = [[None for _ in range(8)] for _ in range(8)]
-        self.movement_history = []
+        self.board = [None] * 64
+        self.bb = [0] * len(PIECE_SYMBOLS)
+        self.occupied_white = 0
+        self.occupied_black = 0
+        self.occupied = 0
+        self.invulnerable = 0
+        self.zhash = 0
+        self.history = []
+        self._legal_cache = {}
+        self._threat_cache = {}
+        self._moves_cache = {}
         self.setup_board()
 
     def setup_board(self):
         """Устанавка начальной расстановки фигур."""
         # Пешки
         for col in range(8):
-            self.board[1][col] = Pawn('white', self.indices_to_pos(1, col))
-            self.board[6][col] = Pawn('black', self.indices_to_pos(6, col))
+            self.place_piece(Pawn('white', IDX_TO_POS[(1 << 3) | col]))
+            self.place_piece(Pawn('black', IDX_TO_POS[(6 << 3) | col]))
         # Ладьи
-        self.board[0][0], self.board[0][7] = Rook('white', 'a1'), Rook('white', 'h1')
-        self.board[7][0], self.board[7][7] = Rook('black', 'a8'), Rook('black', 'h8')
+        for piece in (Rook('white', 'a1'), Rook('white', 'h1'), Rook('black', 'a8'), Rook('black', 'h8')):
+            self.place_piece(piece)
         # Кони
-        self.board[0][1], self.board[0][6] = Knight('white', 'b1'), Knight('white', 'g1')
-        self.board[7][1], self.board[7][6] = Knight('black', 'b8'), Knight('black', 'g8')
+        for piece in (Knight('white', 'b1'), Knight('white', 'g1'), Knight('black', 'b8'), Knight('black', 'g8')):
+            self.place_piece(piece)
         # Слоны
-        self.board[0][2], self.board[0][5] = Bishop('white', 'c1'), Bishop('white', 'f1')
-        self.board[7][2], self.board[7][5] = Bishop('black', 'c8'), Bishop('black', 'f8')
+        for piece in (Bishop('white', 'c1'), Bishop('white', 'f1'), Bishop('black', 'c8'), Bishop('black', 'f8')):
+            self.place_piece(piece)
         # Ферзи
-        self.board[0][3] = Queen('white', 'd1')
-        self.board[7][3] = Queen('black', 'd8')
+        self.place_piece(Queen('white', 'd1'))
+        self.place_piece(Queen('black', 'd8'))
         # Короли
-        self.board[0][4] = King('white', 'e1')
-        self.board[7][4] = King('black', 'e8')
+        self.place_piece(King('white', 'e1'))
+        self.place_piece(King('black', 'e8'))
 
-    def pos_to_indices(self, pos):
-        """Преобразование позиций (например, 'e2') в индексы."""
-        col = ord(pos[0]) - ord('a')
-        row = int(pos[1]) - 1
-        return row, col
+    def pos_to_square(self, pos):
+        """Преобразование позиции (например, 'e2') в номер поля.
 
-    def indices_to_pos(self, row, col):
-        """Преобразование индексов в позиции."""
-        return chr(ord('a') + col) + str(row + 1)
+        Returns:
+            int: Номер поля 0..63 или None, если позиция вне доски.
+        """
+        return POS_TO_IDX.get(pos)
 
-    def get_straight_moves(self, pos, color, super_bishop=False):
-        """Возврат возможных ходов по прямым линиям."""
-        moves = []
-        row, col = self.pos_to_indices(pos)
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                new_row, new_col = row + dr * i, col + dc * i
-                if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                    break
-                target = self.board[new_row][new_col]
-                if target is None:
-                    moves.append(self.indices_to_pos(new_row, new_col))
-                elif target.color != color and not getattr(target, 'invulnerable', False):
-                    moves.append(self.indices_to_pos(new_row, new_col))
-                    break
-                else:
-                    break
-        return moves
+    def parse_move(self, move_str):
+        """Разбор хода в формате 'e2-e4' с явной проверкой символов.
 
-    def get_diagonal_moves(self, pos, color, super_bishop=False):
-        """Возврат возможных ходов по диагоналям."""
-        moves = []
-        row, col = self.pos_to_indices(pos)
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                new_row, new_col = row + dr * i, col + dc * i
-                if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                    break
-                target = self.board[new_row][new_col]
-                if target is None:
-                    moves.append(self.indices_to_pos(new_row, new_col))
-                    if not super_bishop:
-                        continue
-                elif target.color != color and not getattr(target, 'invulnerable', False):
-                    moves.append(self.indices_to_pos(new_row, new_col))
-                    if not super_bishop:
-                        break
-                else:
-                    if not super_bishop:
-                        break
-        return moves
+        Returns:
+            tuple: Номера начального и конечного полей или None, если формат неверен.
+        """
+        if len(move_str) != 5 or move_str[2] != '-':
+            return None
+        start, end = self.pos_to_square(move_str[:2]), self.pos_to_square(move_str[3:])
+        if start is None or end is None:
+            return None
+        return start, end
+
+    def _toggle_piece(self, piece, square):
+        """Переключение бита фигуры на поле во всех битбордах."""
+        bit = 1 << square
+        self.bb[piece.code] ^= bit
+        if piece.color_idx == 0:
+            self.occupied_white ^= bit
+        else:
+            self.occupied_black ^= bit
+        self.occupied ^= bit
+        if piece.invulnerable:
+            self.invulnerable ^= bit
+        self.zhash ^= ZOBRIST[piece.code][square]
+
+    def place_piece(self, piece):
+        """Установка фигуры на её позицию (стоящая там фигура убирается)."""
+        square = piece.sq
+        self._remove_square(square)
+        self.board[square] = piece
+        self._toggle_piece(piece, square)
+        self._legal_cache.clear()
+
+    def remove_piece(self, pos):
+        """Удаление фигуры с позиции.
+
+        Returns:
+            ChessPiece: Удаленная фигура или None, если поле было пустым.
+        """
+        return self._remove_square(POS_TO_IDX[pos])
+
+    def _remove_square(self, square):
+        """Удаление фигуры с поля по его номеру (None, если поле было пустым)."""
+        piece = self.board[square]
+        if piece:
+            self.board[square] = None
+            self._toggle_piece(piece, square)
+            self._legal_cache.clear()
+        return piece
+
+    def get_occupancy(self, color_idx):
+        """Возврат битборда полей, занятых фигурами цвета color_idx (0 - белые, 1 - черные)."""
+        return (self.occupied_white, self.occupied_black)[color_idx]
+
+    def can_capture(self, square, color_idx):
+        """Проверка, может ли фигура цвета color_idx встать на поле (пустое или с уязвимой фигурой соперника)."""
+        return not ((self.get_occupancy(color_idx) | self.invulnerable) >> square) & 1
+
+    def bb_to_positions(self, bb):
+        """Преобразование битборда в список позиций (например, ['a1', 'b2'])."""
+        positions = []
+        while bb:
+            low = bb & -bb
+            square = low.bit_length() - 1
+            positions.append(IDX_TO_POS[square])
+            bb ^= low
+        return positions
+
+    def get_pieces(self, color_idx):
+        """Перебор фигур цвета color_idx по битборду занятости, без обхода всех 64 полей."""
+        own = self.get_occupancy(color_idx)
+        while own:
+            low = own & -own
+            yield self.board[low.bit_length() - 1]
+            own ^= low
+
+    def get_straight_moves(self, square, color_idx):
+        """Возврат возможных ходов по прямым линиям с поля square."""
+        attacks = rook_attacks(square, self.occupied)
+        return self.bb_to_positions(attacks & ~(self.get_occupancy(color_idx) | self.invulnerable))
+
+    def get_diagonal_moves(self, square, color_idx):
+        """Возврат возможных ходов по диагоналям с поля square."""
+        attacks = bishop_attacks(square, self.occupied)
+        return self.bb_to_positions(attacks & ~(self.get_occupancy(color_idx) | self.invulnerable))
+
+    def get_super_diagonal_moves(self, square, color_idx):
+        """Возврат возможных ходов Суперслона с поля square.
+
+        Суперслон проходит сквозь любые фигуры, поэтому его лучи берутся по пустой доске.
+        """
+        attacks = bishop_attacks(square, 0)
+        return self.bb_to_positions(attacks & ~(self.get_occupancy(color_idx) | self.invulnerable))
+
+    def get_queen_moves(self, square, color_idx):
+        """Возврат возможных ходов ферзя с поля square: одно объединение атак ладьи и слона."""
+        attacks = rook_attacks(square, self.occupied) | bishop_attacks(square, self.occupied)
+        return self.bb_to_positions(attacks & ~(self.get_occupancy(color_idx) | self.invulnerable))
 
     def make_move(self, move_str, super_bishop=False):
         """Выполнение хода на доске."""
-        start_pos, end_pos = move_str.split('-')
-        start_row, start_col = self.pos_to_indices(start_pos)
-        end_row, end_col = self.pos_to_indices(end_pos)
-        piece = self.board[start_row][start_col]
-        captured = self.board[end_row][end_col]
-
+        start, end = POS_TO_IDX[move_str[:2]], POS_TO_IDX[move_str[3:]]
+        piece = self.board[start]
+        captured_sq = end
+        if piece.kind == PAWN and (start ^ end) & 7 and not self.board[end]:
+            # Взятие на проходе: побитая пешка стоит на горизонтали начального поля
+            captured_sq = (start & ~7) | (end & 7)
+
+        eaten = []
         if super_bishop:
-            # Суперслон съедает все фигуры на пути
-            dr = -1 if start_row > end_row else 1 if start_row < end_row else 0
-            dc = -1 if start_col > end_col else 1 if start_col < end_col else 0
-            r, c = start_row + dr, start_col + dc
-            while r != end_row or c != end_col:
-                self.board[r][c] = None
-                r += dr
-                c += dc
-
-        self.board[end_row][end_col] = piece
-        self.board[start_row][start_col] = None
-        piece.location = end_pos
-        self.movement_history.append(Move(start_pos, end_pos, piece, captured))
+            # Суперслон съедает все фигуры на пути: перебираются только занятые поля
+            path = BETWEEN[start][end] & self.occupied
+            while path:
+                low = path & -path
+                square = low.bit_length() - 1
+                eaten.append((square, self._remove_square(square)))
+                path ^= low
+
+        captured = self._remove_square(captured_sq)
+        self._toggle_piece(piece, start)
+        self._toggle_piece(piece, end)
+        self.board[end] = piece
+        self.board[start] = None
+        piece.sq = end
+        self.zhash ^= ZOBRIST_SIDE
+        self.history.append(Move(start, end, piece, captured, captured_sq, eaten))
+        self._legal_cache.clear()
 
     def undo_move(self):
         """Отмена последнего хода."""
-        if not self.movement_history:
+        if not self.history:
             return False
-        move = self.movement_history.pop()
-        start_row, start_col = self.pos_to_indices(move.start_pos)
-        end_row, end_col = self.pos_to_indices(move.end_pos)
-        self.board[start_row][start_col] = move.piece
-        self.board[end_row][end_col] = move.captured
-        move.piece.location = move.start_pos
+        move = self.history.pop()
+        start, end = move.start_sq, move.end_sq
+        self.board[start] = move.piece
+        self.board[end] = None
+        move.piece.sq = start
+        self._toggle_piece(move.piece, end)
+        self._toggle_piece(move.piece, start)
+        if move.captured:
+            self.board[move.captured_sq] = move.captured
+            self._toggle_piece(move.captured, move.captured_sq)
+        for square, eaten in move.eaten:
+            self.board[square] = eaten
+            self._toggle_piece(eaten, square)
+        self.zhash ^= ZOBRIST_SIDE
+        self._legal_cache.clear()
         return True
 
-    def display(self):
-        """Отображение доски в консоли."""
-        print('\n  a b c d e f g h')
+    def get_square_symbols(self):
+        """Возврат символов всех 64 полей, собранных по битбордам ('.' для пустых)."""
+        symbols = ['.'] * 64
+        for idx, bb in enumerate(self.bb):
+            while bb:
+                low = bb & -bb
+                symbols[low.bit_length() - 1] = PIECE_SYMBOLS[idx]
+                bb ^= low
+        return symbols
+
+    def render(self, symbols):
+        """Вывод доски по символам 64 полей одной записью в консоль."""
+        lines = ['', '  a b c d e f g h']
         for i in range(7, -1, -1):
-            row = f'{i+1} '
-            for j in range(8):
-                piece = self.board[i][j]
-                row += (piece.symbol if piece else '.') + ' '
-            print(row)
-        print('  a b c d e f g h\n')
+            lines.append(f'{i+1} ' + ' '.join(symbols[i << 3:(i + 1) << 3]) + ' ')
+        lines.append('  a b c d e f g h')
+        sys.stdout.write('\n'.join(lines) + '\n\n')
 
+    def display(self):
+        """Отображение доски в консоли."""
+        self.render(self.get_square_symbols())
 
     def display_with_highlights(self, possible_moves):
         """Отображение доски с подсветкой возможных ходов."""
-        print('\n  a b c d e f g h')
-        for i in range(7, -1, -1):
-            row = f'{i+1} '
-            for j in range(8):
-                pos = self.indices_to_pos(i, j)
-                if pos in possible_moves:
-                    row += '*' + ' '
-                else:
-                    piece = self.board[i][j]
-                    row += (piece.symbol if piece else '.') + ' '
-            print(row)
-        print('  a b c d e f g h\n')
+        symbols = self.get_square_symbols()
+        for pos in possible_moves:
+            symbols[POS_TO_IDX[pos]] = '*'
+        self.render(symbols)
+
+    def get_moves(self, piece):
+        """Возврат списка ходов фигуры с запоминанием по хешу Зобриста позиции.
+
+        Фигура на поле однозначно задается хешем, а от последнего хода зависит
+        взятие на проходе, поэтому ключ - (хеш, поле, последний ход). Возвращаемый
+        список общий для всех обращений к той же позиции и не должен изменяться.
+        """
+        last = self.history[-1] if self.history else None
+        key = (self.zhash, piece.sq, last and (last.start_sq, last.end_sq))
+        return cache_fetch(self._moves_cache, key, MOVES_CACHE_SIZE, lambda: piece.get_possible_moves(self))
+
+    def pseudo_legal_moves(self, color_idx):
+        """Возврат всех ходов фигур цвета color_idx по правилам их перемещения.
+
+        Returns:
+            list: Список ходов в формате ['e2-e4', ...].
+        """
+        moves = []
+        for piece in self.get_pieces(color_idx):
+            moves.extend(IDX_TO_POS[piece.sq] + '-' + target for target in self.get_moves(piece))
+        return moves
+
+    def legal_moves(self, color_idx):
+        """Возврат допустимых ходов цвета color_idx с кешированием до следующего изменения позиции.
+
+        Программа не запрещает ходы под шах, поэтому допустимые ходы совпадают
+        с pseudo_legal_moves; кеш сбрасывается при любом ходе, отмене хода или
+        перестановке фигур.
+        """
+        moves = self._legal_cache.get(color_idx)
+        if moves is None:
+            moves = self._legal_cache[color_idx] = self.pseudo_legal_moves(color_idx)
+        return moves
+
+    def get_pawn_attacks(self, color_idx):
+        """Возврат битборда полей, которые бьют все пешки цвета color_idx, двумя сдвигами.
+
+        Сдвиг на 7 и 9 дает взятия влево и вправо; маски вертикалей отбрасывают
+        поля, перенесенные через край доски.
+        """
+        if color_idx == 0:
+            pawns = self.bb[PAWN]
+            return (((pawns << 7) & NOT_FILE_H) | ((pawns << 9) & NOT_FILE_A)) & MASK64
+        pawns = self.bb[PAWN + len(PIECE_KINDS)]
+        return ((pawns >> 9) & NOT_FILE_H) | ((pawns >> 7) & NOT_FILE_A)
+
+    def get_attacked_squares(self, color_idx):
+        """Возврат битборда полей, на которых фигуры цвета color_idx могут взять фигуру соперника.
+
+        Взятия всех пешек считаются сразу по битборду пешек, остальные фигуры - по одной.
+        """
+        attacks = self.get_pawn_attacks(color_idx)
+        for piece in self.get_pieces(color_idx):
+            if piece.kind != PAWN:
+                attacks |= piece.get_attacks(self)
+        return attacks
 
     def get_threatened_pieces(self, color):
-        """Возврат списка фигур, находящихся под угрозой."""
-        threatened = []
-        opponent_color = 'black' if color == 'white' else 'white'
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.color == color:
-                    for r in range(8):
-                        for c in range(8):
-                            opponent_piece = self.board[r][c]
-                            if opponent_piece and opponent_piece.color == opponent_color:
-                                if piece.position in opponent_piece.get_possible_moves(self):
-                                    threatened.append(piece)
-                                    break
-        return threatened
+        """Возврат списка фигур, находящихся под угрозой.
+
+        Битборд атакованных фигур запоминается по хешу Зобриста позиции, поэтому
+        при возврате в уже встречавшуюся позицию (отмена хода, подсказка) ходы
+        соперника не перебираются заново. Кеш вытесняет давно не использованные
+        позиции, когда их становится больше THREAT_CACHE_SIZE.
+        """
+        color_idx = COLORS.index(color)
+        threatened = cache_fetch(
+            self._threat_cache, (self.zhash, color_idx), THREAT_CACHE_SIZE,
+            lambda: self.get_occupancy(color_idx) & self.get_attacked_squares(1 - color_idx))
+        pieces = []
+        while threatened:
+            low = threatened & -threatened
+            pieces.append(self.board[low.bit_length() - 1])
+            threatened ^= low
+        return pieces
 
 
 class ChessGame:
@@ -438,7 +988,7 @@ class ChessGame:
 
     Attributes:
         board (ChessBoard): Объект шахматной доски.
-        current_player (str): Текущий игрок ('white' или 'black').
+        turn (int): Очередь хода: 0 - белые, 1 - черные.
         move_count (int): Количество сделанных ходов.
         log_file (str): Путь к файлу для записи ходов.
         replacements (dict): Словарь замен фигур для каждого игрока.
@@ -446,12 +996,18 @@ class ChessGame:
     def __init__(self):
         """Инициализация игры."""
         self.board = ChessBoard()
-        self.current_player = 'white'
+        self.turn = 0
         self.move_count = 0
         self.log_file = 'chess_moves.txt'
+        self._log = None
         self.replacements = {'white': {}, 'black': {}}
         self.setup_replacements()
 
+    @property
+    def current_player(self):
+        """Цвет игрока, который сейчас ходит ('white' или 'black')."""
+        return COLORS[self.turn]
+
     def setup_replacements(self):
         """Настройка замены фигур перед началом игры."""
         for player in ['white', 'black']:
@@ -463,24 +1019,29 @@ class ChessGame:
                     if c == '1':
                         self.replacements[player]['Bishop'] = SuperBishop
                         for pos in (('c1', 'f1') if player == 'white' else ('c8', 'f8')):
-                            r, c = self.board.pos_to_indices(pos)
-                            self.board.board[r][c] = None
+                            self.board.remove_piece(pos)
                     elif c == '2':
                         self.replacements[player]['Pawn'] = Fence
                         row = 1 if player == 'white' else 6
                         for col in range(8):
-                            pos = self.board.indices_to_pos(row, col)
-                            self.board.board[row][col] = Fence(player, pos)
+                            pos = IDX_TO_POS[(row << 3) | col]
+                            self.board.place_piece(Fence(player, pos))
                     elif c == '3':
                         self.replacements[player]['King'] = Gosha
                         pos = 'e1' if player == 'white' else 'e8'
-                        r, c = self.board.pos_to_indices(pos)
-                        self.board.board[r][c] = Gosha(player, pos)
+                        self.board.place_piece(Gosha(player, pos))
 
     def save_move_to_file(self, move_str):
-        """Запись хода в файл."""
-        with open(self.log_file, 'a') as f:
-            f.write(f"{self.move_count}. {move_str}\n")
+        """Запись хода в файл.
+
+        Файл открывается при первом ходе и остается открытым до конца игры
+        (закрывается при выходе из интерпретатора); построчная буферизация
+        сбрасывает каждый ход на диск сразу после записи.
+        """
+        if self._log is None:
+            self._log = open(self.log_file, 'a', buffering=1)
+            atexit.register(self._log.close)
+        self._log.write(f"{self.move_count}. {move_str}\n")
 
     def handle_input(self):
         """Обработка ввода пользователя."""
@@ -489,34 +1050,35 @@ class ChessGame:
             self.display_threatened_pieces()
             prompt = f"Введите ход для {self.current_player} (например, 'e2-e4', 'backup' или 'show'): "
             move_str = input(prompt).strip()
-            if move_str.lower() == 'backup':
+            command = move_str.lower()
+            if command == 'backup':
                 if self.board.undo_move():
-                    self.current_player = 'black' if self.current_player == 'white' else 'white'
+                    self.turn ^= 1
                     self.move_count -= 1
                     print("Ход отменен.")
                 else:
                     print("Нет ходов для отмены.")
                 continue
-            elif move_str.lower() == 'show':
+            elif command == 'show':
                 self.show_possible_moves()
                 continue
 
-            if '-' not in move_str:
+            squares = self.board.parse_move(move_str)
+            if squares is None:
                 print("Неверный формат. Используйте 'e2-e4'.")
                 continue
 
-            start_pos, end_pos = move_str.split('-')
-            start_row, start_col = self.board.pos_to_indices(start_pos)
-            piece = self.board.board[start_row][start_col]
+            end_pos = move_str[3:]
+            piece = self.board.board[squares[0]]
 
-            if not piece or piece.color != self.current_player:
+            if not piece or piece.color_idx != self.turn:
                 print("На этой позиции нет вашей фигуры.")
                 continue
 
             if piece.move(end_pos, self.board):
                 self.save_move_to_file(move_str)
                 self.move_count += 1
-                self.current_player = 'black' if self.current_player == 'white' else 'white'
+                self.turn ^= 1
                 break
             else:
                 print("Недопустимый ход.")
@@ -527,17 +1089,17 @@ class ChessGame:
         if threatened:
             print(f"Фигуры {self.current_player}, находящиеся под угрозой:")
             for piece in threatened:
-                print(f"{piece.symbol} на {piece.position}")
+                print(f"{piece.symbol} на {IDX_TO_POS[piece.sq]}")
         else:
             print(f"Нет фигур {self.current_player}, находящихся под угрозой.")
 
     def show_possible_moves(self):
         """Отображение возможных (допустимых) ходов для выбранной фигуры."""
         pos = input("Введите позицию фигуры (например, 'e2'): ").strip()
-        row, col = self.board.pos_to_indices(pos)
-        piece = self.board.board[row][col]
-        if piece and piece.color == self.current_player:
-            moves = piece.get_possible_moves(self.board)
+        square = self.board.pos_to_square(pos)
+        piece = self.board.board[square] if square is not None else None
+        if piece and piece.color_idx == self.turn:
+            moves = self.board.get_moves(piece)
             self.board.display_with_highlights(moves)
         else:
             print("На этой позиции нет вашей фигуры.")
@@ -553,49 +1115,63 @@ class ChessGame:
 # Класс игрового процесса и правил (класс шашек)
 class CheckersPiece(ChessPiece):
     """Класс для шашек."""
-    def __init__(self, color, position):
-        super().__init__(color, position)
-        self.symbol = 'C' if color == 'white' else 'c'
+    __slots__ = ()
+    kind = CHECKER
 
     def get_possible_moves(self, board):
         """Возвращает список возможных ходов для шашки."""
-        moves = []
-        row, col = board.pos_to_indices(self.position)
-        directions = [(-1, -1), (-1, 1)] if self.color == 'white' else [(1, -1), (1, 1)]
-        for dr, dc in directions:
-            new_row, new_col = row + dr, col + dc
-            if 0 <= new_row < 8 and 0 <= new_col < 8:
-                target = board.board[new_row][new_col]
-                if target is None:
-                    moves.append(board.indices_to_pos(new_row, new_col))
-                elif target.color != self.color:
-                    jump_row, jump_col = new_row + dr, new_col + dc
-                    if 0 <= jump_row < 8 and 0 <= jump_col < 8 and board.board[jump_row][jump_col] is None:
-                        moves.append(board.indices_to_pos(jump_row, jump_col))
-        return moves
+        return board.bb_to_positions(self.get_targets(board))
+
+    def get_targets(self, board):
+        """Возвращает битборд полей, на которые может пойти шашка.
+
+        Цвет соседней фигуры определяется по битбордам занятости, без обращения
+        к объекту фигуры: шаг - на пустое поле, прыжок - через фигуру соперника.
+        """
+        empty = ~board.occupied
+        enemy = board.get_occupancy(1 - self.color_idx)
+        targets = 0
+        for step, jump in CHECKER_MOVES[self.color][self.sq]:
+            if step & empty:
+                targets |= step
+            elif step & enemy:
+                targets |= jump & empty
+        return targets
+
+    def is_valid_move(self, new_location, board):
+        """Проверяет ход шашки по битборду её целевых полей."""
+        end = board.pos_to_square(new_location)
+        if end is None:
+            return False
+        return bool((self.get_targets(board) >> end) & 1)
 
 # Класс доски
 class CheckersBoard(ChessBoard):
     """Класс для доски шашек."""
     def setup_board(self):
         """Устанавливает начальную расстановку шашек."""
+        # Шашки стоят на темных полях ((row + col) нечетно): в каждой строке
+        # это каждый второй столбец, начиная с 1 для четных строк и с 0 для нечетных
         for row in range(3):
-            for col in range(8):
-                if (row + col) % 2 == 1:
-                    self.board[row][col] = CheckersPiece('black', self.indices_to_pos(row, col))
+            for col in range(1 - (row & 1), 8, 2):
+                self.place_piece(CheckersPiece('black', IDX_TO_POS[(row << 3) | col]))
         for row in range(5, 8):
-            for col in range(8):
-                if (row + col) % 2 == 1:
-                    self.board[row][col] = CheckersPiece('white', self.indices_to_pos(row, col))
+            for col in range(1 - (row & 1), 8, 2):
+                self.place_piece(CheckersPiece('white', IDX_TO_POS[(row << 3) | col]))
 
 # Класс самой игры
 class CheckersGame:
     """Класс для управления игрой в шашки."""
     def __init__(self):
         self.board = CheckersBoard()
-        self.current_player = 'white'
+        self.turn = 0
         self.move_count = 0
 
+    @property
+    def current_player(self):
+        """Цвет игрока, который сейчас ходит ('white' или 'black')."""
+        return COLORS[self.turn]
+
     def play(self):
         """Запускает основной цикл игры в шашки."""
         print("Добро пожаловать в шашки! Введите ходы в формате 'e2-e4'.")
@@ -603,18 +1179,18 @@ class CheckersGame:
             self.board.display()
             prompt = f"Введите ход для {self.current_player} (например, 'e2-e4'): "
             move_str = input(prompt).strip()
-            if '-' not in move_str:
+            squares = self.board.parse_move(move_str)
+            if squares is None:
                 print("Неверный формат. Используйте 'e2-e4'.")
                 continue
-            start_pos, end_pos = move_str.split('-')
-            start_row, start_col = self.board.pos_to_indices(start_pos)
-            piece = self.board.board[start_row][start_col]
-            if not piece or piece.color != self.current_player:
+            end_pos = move_str[3:]
+            piece = self.board.board[squares[0]]
+            if not piece or piece.color_idx != self.turn:
                 print("На этой позиции нет вашей шашки.")
                 continue
             if piece.move(end_pos, self.board):
                 self.move_count += 1
-                self.current_player = 'black' if self.current_player == 'white' else 'white'
+                self.turn ^= 1
             else:
                 print("Недопустимый ход.")
 